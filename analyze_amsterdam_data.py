@@ -5,6 +5,10 @@ Creates histograms, statistics, and other useful visualizations.
 """
 
 import pandas as pd
+import pyarrow.parquet as pq
+import matplotlib
+# Figures are only saved to disk, so use the non-interactive Agg backend
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
@@ -30,15 +34,37 @@ INSECT_GROUPS = {
     6: ('Other Insects', 'gray')
 }
 
+# Only the columns used by the analyses below are read from the Parquet files
+USECOLS = ['id', 'common_name', 'date', 'location', 'observer', 'group_name']
+
+# Number of rows read from a Parquet file at a time
+CHUNK_SIZE = 100_000
+
+# Low-cardinality text columns kept as pandas categoricals
+CATEGORY_COLUMNS = ['group_name', 'common_name', 'location', 'observer']
+
+def iter_observation_chunks(filepaths, chunk_size=CHUNK_SIZE):
+    """
+    Yield DataFrames of at most chunk_size rows with the needed columns,
+    streamed batch by batch from the given Parquet files.
+    """
+    for filepath in filepaths:
+        try:
+            parquet_file = pq.ParquetFile(filepath)
+            for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=USECOLS):
+                yield batch.to_pandas()
+        except Exception as e:
+            print(f"Error reading {filepath}: {e}")
+
 def load_amsterdam_data():
     """
-    Load all Amsterdam observation data from CSV files.
+    Load all Amsterdam observation data from Parquet files.
     Returns combined DataFrame with all observations.
     """
     print("Loading Amsterdam observation data...")
     
     all_dfs = []
-    amsterdam_files = glob.glob("data/amsterdam/amsterdam_observations_*.csv")
+    amsterdam_files = glob.glob("data/amsterdam/amsterdam_observations_*.parquet")
     
     if not amsterdam_files:
         print("No Amsterdam data files found!")
@@ -46,13 +72,9 @@ def load_amsterdam_data():
     
     print(f"Found {len(amsterdam_files)} Amsterdam data files")
     
-    for filepath in amsterdam_files:
-        try:
-            df = pd.read_csv(filepath)
-            if not df.empty:
-                all_dfs.append(df)
-        except Exception as e:
-            print(f"Error reading {filepath}: {e}")
+    for chunk in iter_observation_chunks(amsterdam_files):
+        if not chunk.empty:
+            all_dfs.append(chunk)
     
     if not all_dfs:
         print("No data loaded!")
@@ -63,9 +85,13 @@ def load_amsterdam_data():
     
     # Remove duplicates
     original_count = len(combined_df)
-    combined_df = combined_df.drop_duplicates(subset=['id'])
+    combined_df = combined_df[~combined_df['id'].duplicated()]
     duplicates_removed = original_count - len(combined_df)
     
+    # Already categorical when written by filter_amsterdam_data.py; this makes sure
+    # of it when several files with different categories were concatenated
+    combined_df[CATEGORY_COLUMNS] = combined_df[CATEGORY_COLUMNS].astype('category')
+    
     print(f"Loaded {len(combined_df)} unique observations")
     if duplicates_removed > 0:
         print(f"Removed {duplicates_removed} duplicate observations")
@@ -82,7 +108,7 @@ def create_group_histogram(df, output_dir):
     group_counts = df['group_name'].value_counts()
     
     # Create figure
-    plt.figure(figsize=(12, 8))
+    fig = plt.figure(figsize=(12, 8))
     bars = plt.bar(range(len(group_counts)), group_counts.values, 
                    color=[INSECT_GROUPS.get(i, ('Unknown', 'gray'))[1] 
                           for i in range(len(group_counts))])
@@ -101,7 +127,7 @@ def create_group_histogram(df, output_dir):
     
     plt.tight_layout()
     plt.savefig(f'{output_dir}/group_histogram.png', dpi=300, bbox_inches='tight')
-    plt.close()
+    plt.close(fig)
     
     return group_counts
 
@@ -111,29 +137,19 @@ def create_species_analysis(df, output_dir, top_n=20):
     """
     print("Creating species analysis...")
     
-    # Count observations by species
-    species_counts = df['common_name'].value_counts().head(top_n)
+    # Count observations by species and record each species' group in one pass
+    top_species = df.groupby('common_name', sort=False, observed=True).agg(
+        count=('id', 'size'), group=('group_name', 'first')
+    ).nlargest(top_n, 'count')
+    species_counts = top_species['count']
     
     # Create figure
-    plt.figure(figsize=(14, 8))
+    fig = plt.figure(figsize=(14, 8))
     bars = plt.barh(range(len(species_counts)), species_counts.values)
     
     # Color bars by group
-    colors = []
-    for species in species_counts.index:
-        # Find which group this species belongs to
-        species_data = df[df['common_name'] == species]
-        if not species_data.empty:
-            group_name = species_data['group_name'].iloc[0]
-            # Find color for this group
-            color = 'gray'
-            for gid, (gname, gcolor) in INSECT_GROUPS.items():
-                if gname == group_name:
-                    color = gcolor
-                    break
-            colors.append(color)
-        else:
-            colors.append('gray')
+    group_to_color = {gname: gcolor for gname, gcolor in INSECT_GROUPS.values()}
+    colors = [group_to_color.get(group, 'gray') for group in top_species['group']]
     
     # Apply colors
     for i, bar in enumerate(bars):
@@ -153,7 +169,7 @@ def create_species_analysis(df, output_dir, top_n=20):
     
     plt.tight_layout()
     plt.savefig(f'{output_dir}/top_species.png', dpi=300, bbox_inches='tight')
-    plt.close()
+    plt.close(fig)
     
     return species_counts
 
@@ -163,16 +179,11 @@ def create_temporal_analysis(df, output_dir):
     """
     print("Creating temporal analysis...")
     
-    # Convert date column
-    df['date'] = pd.to_datetime(df['date'])
-    df['month'] = df['date'].dt.month
-    df['day_of_year'] = df['date'].dt.dayofyear
-    
     # Create figure with subplots
     fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(14, 10))
     
-    # Monthly distribution
-    monthly_counts = df['month'].value_counts().sort_index()
+    # Monthly distribution ('date' is already datetime64 when loaded from Parquet)
+    monthly_counts = df['date'].dt.month.value_counts().sort_index()
     months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
               'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
     
@@ -189,7 +200,7 @@ def create_temporal_analysis(df, output_dir):
                 ha='center', va='bottom', fontweight='bold')
     
     # Daily distribution (day of year)
-    daily_counts = df['day_of_year'].value_counts().sort_index()
+    daily_counts = df['date'].dt.dayofyear.value_counts().sort_index()
     ax2.plot(daily_counts.index, daily_counts.values, marker='o', linewidth=2, markersize=4)
     ax2.set_title('Observations by Day of Year', fontsize=14, fontweight='bold')
     ax2.set_xlabel('Day of Year', fontsize=12)
@@ -198,7 +209,7 @@ def create_temporal_analysis(df, output_dir):
     
     plt.tight_layout()
     plt.savefig(f'{output_dir}/temporal_analysis.png', dpi=300, bbox_inches='tight')
-    plt.close()
+    plt.close(fig)
     
     return monthly_counts, daily_counts
 
@@ -208,22 +219,15 @@ def create_group_comparison(df, output_dir):
     """
     print("Creating group comparison...")
     
-    # Calculate statistics for each group
-    group_stats = []
-    for group_name in df['group_name'].unique():
-        group_data = df[df['group_name'] == group_name]
-        
-        stats = {
-            'Group': group_name,
-            'Total Observations': len(group_data),
-            'Unique Species': group_data['common_name'].nunique(),
-            'Unique Locations': group_data['location'].nunique(),
-            'Unique Observers': group_data['observer'].nunique(),
-            'Avg Observations per Species': len(group_data) / group_data['common_name'].nunique()
-        }
-        group_stats.append(stats)
-    
-    stats_df = pd.DataFrame(group_stats).sort_values('Total Observations', ascending=False)
+    # Calculate statistics for all groups in a single groupby pass
+    stats_df = df.groupby('group_name', sort=False, observed=True).agg(**{
+        'Total Observations': ('id', 'size'),
+        'Unique Species': ('common_name', 'nunique'),
+        'Unique Locations': ('location', 'nunique'),
+        'Unique Observers': ('observer', 'nunique'),
+    })
+    stats_df['Avg Observations per Species'] = stats_df['Total Observations'] / stats_df['Unique Species']
+    stats_df = stats_df.rename_axis('Group').reset_index().sort_values('Total Observations', ascending=False)
     
     # Create comparison plot
     fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(16, 12))
@@ -274,7 +278,7 @@ def create_group_comparison(df, output_dir):
     
     plt.tight_layout()
     plt.savefig(f'{output_dir}/group_comparison.png', dpi=300, bbox_inches='tight')
-    plt.close()
+    plt.close(fig)
     
     return stats_df
 
@@ -284,18 +288,20 @@ def create_summary_statistics(df, output_dir):
     """
     print("Creating summary statistics...")
     
+    # Species counts give both the number of distinct species and the top 10
+    species_counts = df['common_name'].value_counts()
+    
     # Calculate overall statistics
     total_observations = len(df)
-    total_species = df['common_name'].nunique()
-    total_locations = df['location'].nunique()
-    total_observers = df['observer'].nunique()
+    total_species = int((species_counts > 0).sum())
+    total_locations, total_observers = df[['location', 'observer']].nunique()
     date_range = f"{df['date'].min()} to {df['date'].max()}"
     
     # Group statistics
     group_stats = df['group_name'].value_counts()
     
     # Most observed species
-    top_species = df['common_name'].value_counts().head(10)
+    top_species = species_counts.head(10)
     
     # Create summary report
     summary_text = f"""
@@ -1,13 +1,17 @@
 #!/usr/bin/env python3
 """
 Script to filter all observation data to only include entries within the Amsterdam area.
-Reads all available CSV files and saves filtered data to data/amsterdam/ folder.
+Reads all available CSV files and saves filtered data to data/amsterdam/ folder:
+the combined data as Parquet, and per-group and per-date CSV files.
 """
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 import os
 import glob
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 # Amsterdam area boundaries (approximate)
 AMSTERDAM_BOUNDS = {
@@ -17,6 +21,16 @@ AMSTERDAM_BOUNDS = {
     'lat_max': 52.5   # Northern boundary
 }
 
+# Columns of the raw observation files and the types to read them with.
+# 'time' is kept as text so it is written back out unchanged.
+USECOLS = ['id', 'common_name', 'scientific_name', 'date', 'time', 'count',
+           'longitude', 'latitude', 'location', 'observer']
+COLUMN_TYPES = {'id': pa.int64(), 'longitude': pa.float64(), 'latitude': pa.float64(),
+                'date': pa.timestamp('s'), 'time': pa.string()}
+
+# Low-cardinality text columns stored as pandas categoricals
+CATEGORY_COLUMNS = ['group_name', 'common_name', 'location', 'observer']
+
 # Insect group names for reference
 INSECT_GROUPS = {
     4: 'Butterflies',
@@ -32,13 +46,23 @@ INSECT_GROUPS = {
 
 def is_in_amsterdam_area(lat, lon):
     """
-    Check if coordinates are within Amsterdam area boundaries.
+    Check which coordinates are within Amsterdam area boundaries.
+    Takes NumPy arrays of latitudes and longitudes and returns a boolean mask.
+    The mask is combined in place so no intermediate AND results are allocated.
     """
-    if pd.isna(lat) or pd.isna(lon):
-        return False
-    
-    return (AMSTERDAM_BOUNDS['lat_min'] <= lat <= AMSTERDAM_BOUNDS['lat_max'] and
-            AMSTERDAM_BOUNDS['lon_min'] <= lon <= AMSTERDAM_BOUNDS['lon_max'])
+    mask = lat >= AMSTERDAM_BOUNDS['lat_min']
+    mask &= lat <= AMSTERDAM_BOUNDS['lat_max']
+    mask &= lon >= AMSTERDAM_BOUNDS['lon_min']
+    mask &= lon <= AMSTERDAM_BOUNDS['lon_max']
+    return mask
+
+def read_observation_csv(filepath):
+    """
+    Read an observation CSV file with PyArrow's multi-threaded CSV reader.
+    """
+    table = pa_csv.read_csv(filepath, convert_options=pa_csv.ConvertOptions(
+        include_columns=USECOLS, column_types=COLUMN_TYPES, strings_can_be_null=True))
+    return table.to_pandas(split_blocks=True)
 
 def process_observation_file(filepath):
     """
@@ -46,15 +70,14 @@ def process_observation_file(filepath):
     Returns filtered DataFrame or None if no data.
     """
     try:
-        df = pd.read_csv(filepath)
+        df = read_observation_csv(filepath)
         if df.empty:
             return None
             
         # Filter for valid coordinates and Amsterdam area
         df = df.dropna(subset=['longitude', 'latitude'])
-        amsterdam_mask = df.apply(
-            lambda row: is_in_amsterdam_area(row['latitude'], row['longitude']), 
-            axis=1
+        amsterdam_mask = is_in_amsterdam_area(
+            df['latitude'].to_numpy(), df['longitude'].to_numpy()
         )
         
         filtered_df = df[amsterdam_mask].copy()
@@ -73,6 +96,15 @@ def process_observation_file(filepath):
         print(f"Error processing {filepath}: {e}")
         return None
 
+def write_csv_shards(shards, max_workers=8):
+    """
+    Write a list of (DataFrame, filename) pairs to CSV files concurrently.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(df.to_csv, filename, index=False) for df, filename in shards]
+        for future in futures:
+            future.result()
+
 def main():
     """
     Main function to process all observation files and create Amsterdam-filtered datasets.
@@ -93,16 +125,18 @@ def main():
     processed_files = 0
     amsterdam_observations = 0
     
-    for filepath in observation_files:
-        print(f"Processing {filepath}...")
-        filtered_df = process_observation_file(filepath)
-        
-        if filtered_df is not None:
-            all_amsterdam_data.append(filtered_df)
-            amsterdam_observations += len(filtered_df)
-            print(f"  Found {len(filtered_df)} Amsterdam observations")
-        
-        processed_files += 1
+    # Files are independent, so filter them in parallel worker processes
+    with ProcessPoolExecutor() as executor:
+        results = executor.map(process_observation_file, observation_files, chunksize=8)
+        for filepath, filtered_df in zip(observation_files, results):
+            print(f"Processing {filepath}...")
+            
+            if filtered_df is not None:
+                all_amsterdam_data.append(filtered_df)
+                amsterdam_observations += len(filtered_df)
+                print(f"  Found {len(filtered_df)} Amsterdam observations")
+            
+            processed_files += 1
     
     if not all_amsterdam_data:
         print("No Amsterdam observations found in any files!")
@@ -114,43 +148,52 @@ def main():
     
     # Remove duplicates based on observation ID
     original_count = len(combined_df)
-    combined_df = combined_df.drop_duplicates(subset=['id'])
+    combined_df = combined_df[~combined_df['id'].duplicated()]
     duplicates_removed = original_count - len(combined_df)
     
+    # Store the repetitive text columns as categoricals (integer codes plus one
+    # copy of each distinct value); this also dictionary-encodes them in Parquet
+    combined_df[CATEGORY_COLUMNS] = combined_df[CATEGORY_COLUMNS].astype('category')
+    
     print(f"Combined data: {len(combined_df)} unique observations")
     if duplicates_removed > 0:
         print(f"Removed {duplicates_removed} duplicate observations")
     
     # Save combined Amsterdam data
-    output_file = "data/amsterdam/amsterdam_observations_all.csv"
-    combined_df.to_csv(output_file, index=False)
+    output_file = "data/amsterdam/amsterdam_observations_all.parquet"
+    combined_df.to_parquet(output_file, index=False, compression='zstd')
     print(f"Saved combined Amsterdam data to {output_file}")
     
     # Save data by insect group
     print("\nSaving data by insect group...")
+    group_shards = []
     for group_id, group_name in INSECT_GROUPS.items():
         group_data = combined_df[combined_df['group_name'] == group_name]
         if not group_data.empty:
             group_file = f"data/amsterdam/amsterdam_observations_{group_name.lower()}.csv"
-            group_data.to_csv(group_file, index=False)
+            group_shards.append((group_data, group_file))
             print(f"  {group_name}: {len(group_data)} observations -> {group_file}")
+    write_csv_shards(group_shards)
     
     # Save data by date
     print("\nSaving data by date...")
-    combined_df['date_only'] = pd.to_datetime(combined_df['date']).dt.date
+    # Keep the day as datetime64 so grouping hashes integers rather than date objects
+    combined_df['date_only'] = combined_df['date'].dt.normalize()
+    date_shards = []
     for date, group in combined_df.groupby('date_only'):
         date_str = date.strftime('%Y-%m-%d')
         date_file = f"data/amsterdam/amsterdam_observations_{date_str}.csv"
-        group.to_csv(date_file, index=False)
+        date_shards.append((group, date_file))
         print(f"  {date_str}: {len(group)} observations -> {date_file}")
+    write_csv_shards(date_shards)
     
     # Create summary statistics
     summary_stats = {
         'total_amsterdam_observations': len(combined_df),
         'total_files_processed': processed_files,
         'date_range': {
-            'start': combined_df['date_only'].min(),
-            'end': combined_df['date_only'].max()
+            'start': combined_df['date_only'].min().strftime('%Y-%m-%d'),
+            'end': combined_df['date_only'].max().strftime('%Y-%m-%d')
         },
         'observations_by_group': combined_df['group_name'].value_counts().to_dict(),
         'observations_by_date': combined_df['date_only'].value_counts().sort_index().to_dict()
@@ -171,7 +214,7 @@ def main():
         
         f.write(f"\nObservations by date:\n")
         for date, count in summary_stats['observations_by_date'].items():
-            f.write(f"  {date}: {count}\n")
+            f.write(f"  {date.strftime('%Y-%m-%d')}: {count}\n")
     
     print(f"\nSummary statistics saved to {summary_file}")
     print(f"\nAmsterdam data filtering complete!")
@@ -1,10 +1,12 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import datetime
 import pandas as pd
+import numpy as np
 import os
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import glob
-import time
 
 # From https://waarneming.nl/api/docs/misc.md#species-groups
 INSECT_GROUP_IDS = [
@@ -31,10 +33,54 @@ INSECT_GROUP_NAMES = {
     6: "Other Insects",
 }
 
+# Maximum number of concurrent API requests
+MAX_WORKERS = 20
+
+# Shared session so connections to the API are kept alive and reused by all
+# worker threads. Rate limiting (429) and transient server errors are retried
+# by urllib3 with exponential backoff, honouring any Retry-After header.
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(
+    pool_maxsize=MAX_WORKERS,
+    max_retries=Retry(total=3, backoff_factor=1, status_forcelist=[429, 502, 503, 504]),
+))
+
+# Flattened API fields and the CSV columns they are saved as
+OBSERVATION_FIELDS = {
+    'id': 'id',
+    'species_detail.name': 'common_name',
+    'species_detail.scientific_name': 'scientific_name',
+    'date': 'date',
+    'time': 'time',
+    'number': 'count',
+    'location_detail.name': 'location',
+    'user_detail.name': 'observer',
+}
+
+CSV_COLUMNS = ['id', 'common_name', 'scientific_name', 'date', 'time', 'count',
+               'longitude', 'latitude', 'location', 'observer']
+
+def parse_observations(results):
+    """
+    Flattens a page of API observations into a DataFrame with the CSV columns.
+    """
+    df = pd.json_normalize(results, max_level=1)
+    df = df.reindex(columns=[*OBSERVATION_FIELDS, 'point.coordinates']).rename(columns=OBSERVATION_FIELDS)
+    # Fill a preallocated (n, 2) float array instead of building a frame from lists;
+    # observations without valid coordinates stay NaN
+    coordinates = np.full((len(df), 2), np.nan)
+    for i, point in enumerate(df.pop('point.coordinates')):
+        if isinstance(point, list) and len(point) == 2:
+            coordinates[i] = point
+    df['longitude'] = coordinates[:, 0]
+    df['latitude'] = coordinates[:, 1]
+    return df[CSV_COLUMNS]
+
 def fetch_and_append_to_csv(species_group_id, target_date, filename):
     """
     Fetches all observations for a single species group on a specific day
-    and appends them to the given CSV file, page by page.
+    and appends them to the given CSV file in a single write once all pages
+    have been fetched.
     """
     print(f"Fetching observations for group {species_group_id} on {target_date.strftime('%Y-%m-%d')}")
     url = "https://waarneming.nl/api/v1/observations/"
@@ -49,30 +95,14 @@ def fetch_and_append_to_csv(species_group_id, target_date, filename):
     print(f"Fetching observations for group {species_group_id} on {target_date.strftime('%Y-%m-%d')} with params: {params}")
 
     total_fetched = 0
-    write_header = not os.path.exists(filename)
+    page_dfs = []
 
     while True:
-        response = None
-        for attempt in range(3): # Retry up to 3 times
-            try:
-                response = requests.get(url, params=params)
-                response.raise_for_status()
-                break  # Success
-            except requests.exceptions.HTTPError as e:
-                if e.response.status_code == 429 and attempt < 2:
-                    wait_time = 2 ** attempt
-                    print(f"Rate limited for group {species_group_id} on {target_date}. Retrying in {wait_time}s...")
-                    time.sleep(wait_time)
-                else:
-                    print(f"Request error for group {species_group_id} on {target_date}: {e}")
-                    response = None
-                    break
-            except requests.exceptions.RequestException as e:
-                print(f"Request error for group {species_group_id} on {target_date}: {e}")
-                response = None
-                break
-
-        if response is None:
+        try:
+            response = SESSION.get(url, params=params)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            print(f"Request error for group {species_group_id} on {target_date}: {e}")
             break
 
         try:
@@ -87,51 +117,27 @@ def fetch_and_append_to_csv(species_group_id, target_date, filename):
 
         total_fetched += len(results)
         
-        parsed_data = []
-        for obs in results:
-            species_detail = obs.get('species_detail', {})
-            point = obs.get('point', {})
-            coordinates = point.get('coordinates', [None, None])
-            location_detail = obs.get('location_detail', {})
-            user_detail = obs.get('user_detail', {})
-            parsed_data.append({
-                'id': obs.get('id'),
-                'common_name': species_detail.get('name'),
-                'scientific_name': species_detail.get('scientific_name'),
-                'date': obs.get('date'),
-                'time': obs.get('time'),
-                'count': obs.get('number'),
-                'longitude': coordinates[0] if coordinates else None,
-                'latitude': coordinates[1] if coordinates else None,
-                'location': location_detail.get('name'),
-                'observer': user_detail.get('name')
-            })
-        
-        df = pd.DataFrame(parsed_data)
-        df.to_csv(filename, mode='a', index=False, header=write_header)
-        write_header = False
+        page_dfs.append(parse_observations(results))
 
         if data.get('next') is None:
             break
         params['offset'] += len(results)
 
+    if page_dfs:
+        write_header = not os.path.exists(filename)
+        with open(filename, 'a', newline='', buffering=1 << 20) as f:
+            pd.concat(page_dfs, ignore_index=True).to_csv(f, index=False, header=write_header)
+
     print(f"Fetched {total_fetched} observations for group {species_group_id} on {target_date}")
     return total_fetched
 
-def process_day(target_date):
+def process_group_day(group_id, target_date):
     """
-    Worker function for a thread. Fetches data for all insect groups for a single day
-    and saves it to a single CSV file for that day.
+    Worker function for a thread. Fetches data for one insect group on a single day
+    and saves it to the CSV file for that group and day.
     """
-    print(f"Processing date: {target_date}")
-    
-    total_obs_for_day = 0
-    for group_id in INSECT_GROUP_IDS:
-        filename = f'observations_{target_date.strftime("%Y-%m-%d")}_{group_id}.csv'
-        count = fetch_and_append_to_csv(group_id, target_date, filename)
-        total_obs_for_day += count
-        
-    return f"Finished processing for date: {target_date}. Total observations: {total_obs_for_day}"
+    filename = f'observations_{target_date.strftime("%Y-%m-%d")}_{group_id}.csv'
+    return fetch_and_append_to_csv(group_id, target_date, filename)
 
 if __name__ == "__main__":
     print("Cleaning up old observation files...")
@@ -142,15 +148,24 @@ if __name__ == "__main__":
     start_date = today - datetime.timedelta(days=30)
     dates_to_process = [start_date + datetime.timedelta(days=i) for i in range((today - start_date).days)]
 
-    with ThreadPoolExecutor(max_workers=7) as executor:
-        print(f"Starting fetching for {len(dates_to_process)} days...")
-        futures = [executor.submit(process_day, date) for date in dates_to_process]
+    # Every (group, day) pair is an independent request chain, so they are all
+    # submitted at once and MAX_WORKERS bounds the number of requests in flight
+    tasks = [(group_id, date) for date in dates_to_process for group_id in INSECT_GROUP_IDS]
+    totals_per_day = {date: 0 for date in dates_to_process}
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        print(f"Starting fetching for {len(dates_to_process)} days ({len(tasks)} group/day combinations)...")
+        futures = {executor.submit(process_group_day, group_id, date): (group_id, date)
+                   for group_id, date in tasks}
         
         for future in as_completed(futures):
+            group_id, date = futures[future]
             try:
-                result = future.result()
-                print(result)
+                totals_per_day[date] += future.result()
             except Exception as exc:
-                print(f"A thread generated an exception: {exc}")
+                print(f"A thread generated an exception for group {group_id} on {date}: {exc}")
+
+    for date, total in totals_per_day.items():
+        print(f"Finished processing for date: {date}. Total observations: {total}")
     
     print("\nAll finished.")
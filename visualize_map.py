@@ -1,10 +1,15 @@
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
 import folium
-from folium.plugins import MarkerCluster
+from folium.plugins import FastMarkerCluster
 import sys
 import os
 import datetime
+import json
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 
 # Define a color palette and names for the insect groups
 # Using colors distinct from green (used for green roofs)
@@ -20,6 +25,107 @@ INSECT_GROUPS = {
     6: ('Other Insects', 'gray')
 }
 
+# Translation table that deletes the separators group names may be written with
+GROUP_NAME_SEPARATORS = str.maketrans('', '', ' ,_')
+
+def normalize_group_name(name):
+    """
+    Reduce a group name to a comparable key, so that e.g. 'Bees, Wasps and Ants'
+    and 'Bees_Wasps_and_Ants' match.
+    """
+    return name.translate(GROUP_NAME_SEPARATORS).lower()
+
+# Normalized group name -> group id, for data files that store the group name
+NAME_TO_GROUP_ID = {normalize_group_name(name): group_id for group_id, (name, color) in INSECT_GROUPS.items()}
+
+# Colors of the marker clusters of each insect group, matching the group colors
+MARKER_CLUSTER_CSS = '''
+<style>
+.marker-cluster-small {
+    background-color: rgba(181, 226, 140, 0.6);
+}
+.marker-cluster-small div {
+    background-color: rgba(110, 204, 57, 0.6);
+}
+
+/* Custom colors for different species groups */
+.marker-cluster-red {
+    background-color: rgba(255, 0, 0, 0.6) !important;
+}
+.marker-cluster-red div {
+    background-color: rgba(200, 0, 0, 0.8) !important;
+}
+
+.marker-cluster-blue {
+    background-color: rgba(0, 0, 255, 0.6) !important;
+}
+.marker-cluster-blue div {
+    background-color: rgba(0, 0, 200, 0.8) !important;
+}
+
+.marker-cluster-darkblue {
+    background-color: rgba(0, 0, 139, 0.6) !important;
+}
+.marker-cluster-darkblue div {
+    background-color: rgba(0, 0, 100, 0.8) !important;
+}
+
+.marker-cluster-purple {
+    background-color: rgba(128, 0, 128, 0.6) !important;
+}
+.marker-cluster-purple div {
+    background-color: rgba(100, 0, 100, 0.8) !important;
+}
+
+.marker-cluster-orange {
+    background-color: rgba(255, 165, 0, 0.6) !important;
+}
+.marker-cluster-orange div {
+    background-color: rgba(200, 130, 0, 0.8) !important;
+}
+
+.marker-cluster-darkred {
+    background-color: rgba(139, 0, 0, 0.6) !important;
+}
+.marker-cluster-darkred div {
+    background-color: rgba(100, 0, 0, 0.8) !important;
+}
+
+.marker-cluster-lightred {
+    background-color: rgba(255, 99, 99, 0.6) !important;
+}
+.marker-cluster-lightred div {
+    background-color: rgba(200, 70, 70, 0.8) !important;
+}
+
+.marker-cluster-pink {
+    background-color: rgba(255, 192, 203, 0.6) !important;
+}
+.marker-cluster-pink div {
+    background-color: rgba(200, 150, 160, 0.8) !important;
+}
+
+.marker-cluster-gray {
+    background-color: rgba(128, 128, 128, 0.6) !important;
+}
+.marker-cluster-gray div {
+    background-color: rgba(100, 100, 100, 0.8) !important;
+}
+</style>
+'''
+
+# Observation columns used by the map, and the types to read them with.
+# Single precision is plenty for plotting coordinates.
+USECOLS = ['id', 'common_name', 'scientific_name', 'longitude', 'latitude', 'location', 'observer']
+COLUMN_TYPES = {'id': pa.int64(), 'longitude': pa.float32(), 'latitude': pa.float32(),
+                'common_name': pa.string(), 'scientific_name': pa.string(),
+                'location': pa.string(), 'observer': pa.string(), 'group_name': pa.string()}
+
+# Directory for Parquet copies of loaded observation data, reused across runs
+CACHE_DIR = '_cache'
+# Parquet metadata key under which a cache file records the source files it was built from
+CACHE_SOURCES_KEY = b'observation_sources'
+
 def load_green_roof_data():
     """
     Load green roof data from DAKEN.csv file.
@@ -40,6 +146,70 @@ def load_green_roof_data():
         print(f"Error loading green roof data: {e}")
         return pd.DataFrame()
 
+def as_text(series):
+    """
+    Convert a column to text for display, with missing values left blank.
+    """
+    return series.astype(str).where(series.notna(), '')
+
+def describe_sources(stats):
+    """
+    Describe a set of source files by name, size and modification time, given
+    their stat results keyed by file name.
+    """
+    return json.dumps(sorted([name, st.st_size, st.st_mtime_ns] for name, st in stats.items())).encode()
+
+def read_cache(cache_file, sources):
+    """
+    Read a cached observation DataFrame if it was built from exactly the
+    described source files. Returns None otherwise, or if the cache file
+    cannot be read.
+    """
+    if not os.path.exists(cache_file):
+        return None
+    try:
+        # The schema is read from the file footer only, before loading any data
+        if (pq.read_schema(cache_file).metadata or {}).get(CACHE_SOURCES_KEY) != sources:
+            return None
+        return pd.read_parquet(cache_file)
+    except Exception as e:
+        print(f"Ignoring unreadable cache file {cache_file}: {e}")
+        return None
+
+def write_cache(df, cache_file, sources):
+    """
+    Save an observation DataFrame as a cache file, recording the described
+    source files in the Parquet metadata.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({**table.schema.metadata, CACHE_SOURCES_KEY: sources})
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    # Write to a temporary file and move it into place, so an interrupted or
+    # concurrent run never leaves a partial cache file behind
+    temp_file = f"{cache_file}.{os.getpid()}.tmp"
+    try:
+        pq.write_table(table, temp_file, compression='zstd')
+        os.replace(temp_file, cache_file)
+    except Exception as e:
+        print(f"Error writing cache file {cache_file}: {e}")
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+def read_observation_file(filename, usecols=USECOLS):
+    """
+    Read the used columns of one observation CSV file with PyArrow's
+    multi-threaded CSV parser.
+    Returns None if the file cannot be read.
+    """
+    try:
+        table = pa_csv.read_csv(filename, convert_options=pa_csv.ConvertOptions(
+            include_columns=usecols, column_types=COLUMN_TYPES, strings_can_be_null=True))
+        df = table.to_pandas(split_blocks=True)
+    except Exception as e:
+        print(f"Error reading {filename}: {e}")
+        return None
+    return df
+
 def visualize_date_range_on_map(start_date_str, end_date_str, use_amsterdam=False, show_green_roofs=True, max_observations=5000):
     """
     Generates an interactive map of the Netherlands with clustered, color-coded
@@ -56,54 +226,77 @@ def visualize_date_range_on_map(start_date_str, end_date_str, use_amsterdam=Fals
     end_date = datetime.datetime.strptime(end_date_str, '%Y-%m-%d').date()
     
     all_dfs = []
+    # Format every date in the range in one call rather than once per file
+    date_strs = pd.date_range(start_date, end_date).strftime('%Y-%m-%d').tolist()
+    usecols = USECOLS
     
     if use_amsterdam:
         # Use Amsterdam-specific data files
         print("Using Amsterdam-specific data...")
-        for date in pd.date_range(start_date, end_date):
-            date_str = date.strftime('%Y-%m-%d')
-            filename = f'data/amsterdam/amsterdam_observations_{date_str}.csv'
-            if os.path.exists(filename):
-                try:
-                    df = pd.read_csv(filename)
-                    if not df.empty:
-                        all_dfs.append(df)
-                        print(f"  Loaded {len(df)} Amsterdam observations for {date_str}")
-                except Exception as e:
-                    print(f"Error reading Amsterdam data for {date_str}: {e}")
+        usecols = USECOLS + ['group_name']
+        data_dir = 'data/amsterdam'
+        candidates = [(f'amsterdam_observations_{date_str}.csv', None)
+                      for date_str in date_strs]
     else:
-        # Use general observation files
+        # Use general observation files, one per day and insect group
         print("Using general observation data...")
-        for date in pd.date_range(start_date, end_date):
-            date_str = date.strftime('%Y-%m-%d')
-            # Iterate through each insect group for that day
-            for group_id in INSECT_GROUPS:
-                filename = f'observations_{date_str}_{group_id}.csv'
-                if os.path.exists(filename):
-                    try:
-                        df = pd.read_csv(filename)
-                        if not df.empty:
-                            df['group_id'] = group_id
-                            all_dfs.append(df)
-                    except Exception as e:
-                        print(f"Error reading or processing CSV for group {group_id} on {date_str}: {e}")
+        data_dir = '.'
+        candidates = [(f'observations_{date_str}_{group_id}.csv', group_id)
+                      for date_str in date_strs for group_id in INSECT_GROUPS]
+    
+    # List the data directory once instead of checking every candidate file,
+    # and stat only the entries that are candidates
+    candidate_names = {name for name, group_id in candidates}
+    stats = {}
+    if os.path.isdir(data_dir):
+        stats = {entry.name: entry.stat() for entry in os.scandir(data_dir)
+                 if entry.name in candidate_names and entry.is_file()}
+    # Zero-byte files hold no observations, so they are skipped without parsing
+    sources = [(name, group_id) for name, group_id in candidates
+               if name in stats and stats[name].st_size > 0]
+    paths = [(os.path.join(data_dir, name), group_id) for name, group_id in sources]
+    
+    # Reuse the Parquet copy of the loaded data while it was built from exactly
+    # the current source files; otherwise parse the CSV files and refresh it
+    cache_file = os.path.join(CACHE_DIR, f"observations_{start_date_str}_{end_date_str}"
+                              f"{'_amsterdam' if use_amsterdam else ''}.parquet")
+    source_files = [filename for filename, group_id in paths]
+    # Every candidate file that exists is recorded, including the empty ones that
+    # are skipped, so deleting, emptying or filling any of them invalidates the cache
+    cache_sources = describe_sources(stats)
+    
+    combined_df = read_cache(cache_file, cache_sources) if source_files else None
+    if combined_df is not None:
+        print(f"Loading cached observation data from {cache_file}")
+    else:
+        # Files are independent and the CSV parser releases the GIL, so read
+        # them on a thread pool; results come back in the order of the paths
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            dfs = list(executor.map(lambda filename: read_observation_file(filename, usecols), source_files))
+        
+        read_failed = False
+        for (filename, group_id), df in zip(paths, dfs):
+            if df is None:
+                read_failed = True
+                continue
+            if df.empty:
+                continue
+            if group_id is not None:
+                df['group_id'] = group_id
+            else:
+                print(f"  Loaded {len(df)} Amsterdam observations from {filename}")
+            all_dfs.append(df)
 
-    if not all_dfs:
-        data_type = "Amsterdam" if use_amsterdam else "general"
-        print(f"No {data_type} observation data found for the date range {start_date_str} to {end_date_str}.")
-        return
+        if not all_dfs:
+            data_type = "Amsterdam" if use_amsterdam else "general"
+            print(f"No {data_type} observation data found for the date range {start_date_str} to {end_date_str}.")
+            return
 
-    # Concatenate all dataframes and drop duplicates
-    combined_df = pd.concat(all_dfs, ignore_index=True)
-    combined_df.drop_duplicates(subset=['id'], inplace=True)
-    
-    # # Sample data if too many observations (for performance)
-    # if len(combined_df) > max_observations:
-    #     print(f"Sampling {max_observations} observations from {len(combined_df)} total observations for better performance")
-    #     combined_df = combined_df.sample(n=max_observations, random_state=42)
-    
-    # Filter out invalid coordinates
-    combined_df.dropna(subset=['longitude', 'latitude'], inplace=True)
+        # Concatenate all dataframes
+        combined_df = pd.concat(all_dfs, ignore_index=True)
+        # A file that failed to read is missing from the frame, so it is not cached
+        if not read_failed:
+            write_cache(combined_df, cache_file, cache_sources)
     
     # Apply geographic filtering based on data type
     if use_amsterdam:
@@ -119,10 +312,45 @@ def visualize_date_range_on_map(start_date_str, end_date_str, use_amsterdam=Fals
             'lat_min': 50.75, 'lat_max': 53.7
         }
     
-    combined_df = combined_df[
-        (combined_df['longitude'] >= bounds['lon_min']) & (combined_df['longitude'] <= bounds['lon_max']) &
-        (combined_df['latitude'] >= bounds['lat_min']) & (combined_df['latitude'] <= bounds['lat_max'])
-    ]
+    # Compare on the raw NumPy arrays (no index alignment) and combine the
+    # comparisons into one mask in place. Missing coordinates compare False,
+    # so this also filters out invalid coordinates.
+    lon = combined_df['longitude'].to_numpy()
+    lat = combined_df['latitude'].to_numpy()
+    in_bounds = lon >= bounds['lon_min']
+    in_bounds &= lon <= bounds['lon_max']
+    in_bounds &= lat >= bounds['lat_min']
+    in_bounds &= lat <= bounds['lat_max']
+    combined_df = combined_df[in_bounds]
+    
+    # Drop duplicate observations with a single hash pass over the id column,
+    # only among the observations that are kept
+    combined_df = combined_df[~combined_df['id'].duplicated()]
+    
+    # # Sample data if too many observations (for performance)
+    # if len(combined_df) > max_observations:
+    #     print(f"Sampling {max_observations} observations from {len(combined_df)} total observations for better performance")
+    #     combined_df = combined_df.sample(n=max_observations, random_state=42)
+    
+    # Amsterdam files store the group name rather than the id; look the id up
+    # once per distinct name and map it onto the column
+    if use_amsterdam:
+        group_ids = {name: NAME_TO_GROUP_ID.get(normalize_group_name(name))
+                     for name in combined_df['group_name'].dropna().unique()}
+        combined_df['group_id'] = combined_df['group_name'].map(group_ids)
+        # Keep the group name as written in the Amsterdam files
+        group_names = combined_df['group_name']
+    else:
+        group_names = combined_df['group_id'].map({group_id: name for group_id, (name, color) in INSECT_GROUPS.items()})
+    
+    # Build the popup text of every observation in one vectorized pass
+    combined_df['popup'] = (
+        "<b>Group:</b> " + as_text(group_names) + "<br>"
+        "<b>Species:</b> " + as_text(combined_df['common_name']) + "<br>"
+        "<i>(" + as_text(combined_df['scientific_name']) + ")</i><br>"
+        "<b>Observer:</b> " + as_text(combined_df['observer']) + "<br>"
+        "<b>Location:</b> " + as_text(combined_df['location'])
+    )
 
     if combined_df.empty:
         data_type = "Amsterdam" if use_amsterdam else "general"
@@ -159,32 +387,45 @@ def visualize_date_range_on_map(start_date_str, end_date_str, use_amsterdam=Fals
             min_area = green_roof_df['Groen_m2'].min()
             max_area = green_roof_df['Groen_m2'].max()
             
-            for idx, row in green_roof_df.iterrows():
-                # Calculate radius proportional to green area (5-50 pixels)
-                area = row['Groen_m2']
-                radius = 5 + (area - min_area) / (max_area - min_area) * 45
-                
-                # Create popup text
-                popup_text = (
-                    f"<b>Green Roof</b><br>"
-                    f"<b>Address:</b> {row['Adres']}<br>"
-                    f"<b>Green Area:</b> {area:.0f} m²<br>"
-                    f"<b>Total Area:</b> {row['Totaal_m2']} m²<br>"
-                    f"<b>District:</b> {row['Stadsdeel']}<br>"
-                    f"<b>Year:</b> {row['Realisatiejaar']}"
-                )
-                
-                # Add circle marker to green roof layer
-                folium.CircleMarker(
-                    location=[row['LAT'], row['LNG']],
-                    radius=radius,
-                    popup=popup_text,
+            # Calculate radius proportional to green area (5-50 pixels) for all roofs at once
+            radii = 5 + (green_roof_df['Groen_m2'].to_numpy() - min_area) / (max_area - min_area) * 45
+            
+            # Collect all roofs into one GeoJSON layer: the points are embedded as a
+            # single data blob and the browser creates the circle markers from it
+            popups = (
+                "<b>Green Roof</b><br>"
+                "<b>Address:</b> " + as_text(green_roof_df['Adres']) + "<br>"
+                "<b>Green Area:</b> " + as_text(green_roof_df['Groen_m2'].round().astype('int64')) + " m²<br>"
+                "<b>Total Area:</b> " + as_text(green_roof_df['Totaal_m2']) + " m²<br>"
+                "<b>District:</b> " + as_text(green_roof_df['Stadsdeel']) + "<br>"
+                "<b>Year:</b> " + as_text(green_roof_df['Realisatiejaar'])
+            )
+            features = [
+                {
+                    'type': 'Feature',
+                    'geometry': {'type': 'Point', 'coordinates': [lng, lat]},
+                    'properties': {'radius': radius, 'popup': popup_text}
+                }
+                for lng, lat, radius, popup_text in zip(green_roof_df['LNG'], green_roof_df['LAT'], radii, popups)
+            ]
+            
+            # Add circle markers to green roof layer
+            folium.GeoJson(
+                {'type': 'FeatureCollection', 'features': features},
+                marker=folium.CircleMarker(
                     color='green',
                     weight=2,
                     fillColor='lightgreen',
                     fillOpacity=0.6,
                     opacity=0.8
-                ).add_to(green_roof_layer)
+                ),
+                on_each_feature=folium.JsCode("""
+                function (feature, layer) {
+                    layer.setRadius(feature.properties.radius);
+                    layer.bindPopup(feature.properties.popup, {maxWidth: '100%'});
+                }
+                """)
+            ).add_to(green_roof_layer)
         else:
             print("No green roof data found or error loading data.")
     
@@ -192,57 +433,39 @@ def visualize_date_range_on_map(start_date_str, end_date_str, use_amsterdam=Fals
     if show_green_roofs:
         green_roof_layer.add_to(m)
     
-    # Group data by species for clustering
-    species_data = {}
-    for idx, row in combined_df.iterrows():
-        # Handle both general data (with group_id) and Amsterdam data (with group_name)
-        if 'group_id' in row and not pd.isna(row['group_id']):
-            group_id = int(row['group_id'])
-            group_name, group_color = INSECT_GROUPS.get(group_id, ('Unknown', 'gray'))
-        elif 'group_name' in row and not pd.isna(row['group_name']):
-            group_name = row['group_name']
-            # Find the color and group_id for this group name
-            # Handle both underscore and space versions
-            group_color = 'gray'
-            group_id = None
-            for gid, (gname, gcolor) in INSECT_GROUPS.items():
-                # Check both the original name and underscore version
-                # Also handle the specific case of "Bugs, Plant Lice and Cicadas" vs "Bugs_Plant_Lice_and_Cicadas"
-                normalized_gname = gname.replace(' ', '_').replace(',', '').replace('_', '')
-                normalized_group_name = group_name.replace('_', '').replace(',', '')
-                if (gname == group_name or 
-                    gname.replace(' ', '_') == group_name or
-                    normalized_gname == normalized_group_name):
-                    group_color = gcolor
-                    group_id = gid
-                    break
-        else:
-            group_name = 'Unknown'
-            group_color = 'gray'
-            group_id = None
-        
-        if group_id not in species_data:
-            species_data[group_id] = []
-        
-        species_data[group_id].append({
-            'lat': row['latitude'],
-            'lon': row['longitude'],
-            'group_name': group_name,
-            'group_color': group_color,
-            'common_name': row['common_name'],
-            'scientific_name': row['scientific_name'],
-            'observer': row['observer'],
-            'location': row['location']
-        })
-    
-    # Add species layers to map with clustering
-    for group_id, data_list in species_data.items():
+    # Add species layers to map with clustering. FastMarkerCluster embeds each
+    # group's markers as one compact [lat, lon, popup] array and creates the
+    # Leaflet markers in the browser, instead of one Marker object per observation.
+    # Observations of unknown groups (no group id) have no layer and are skipped.
+    # Only the marker columns are split per group, not the whole frame.
+    marker_columns = combined_df[['latitude', 'longitude', 'popup']]
+    for group_id, group_df in marker_columns.groupby(combined_df['group_id'], sort=False):
+        group_id = int(group_id)
         if group_id in species_layers:
             # Create a marker cluster for this species
-            group_name, group_color = INSECT_GROUPS[group_id]
+            group_color = INSECT_GROUPS[group_id][1]
+            
+            marker_data = group_df.to_numpy().tolist()
             
-            # Create marker cluster with custom icon function
-            marker_cluster = MarkerCluster(
+            # Create marker cluster with custom marker and icon functions
+            FastMarkerCluster(
+                marker_data,
+                # The icon is created once per group and shared by all of its markers
+                callback=f"""
+                (function () {{
+                    var icon = L.AwesomeMarkers.icon({{
+                        markerColor: '{group_color}',
+                        iconColor: 'white',
+                        icon: 'info-sign',
+                        prefix: 'glyphicon'
+                    }});
+                    return function (row) {{
+                        var marker = L.marker(new L.LatLng(row[0], row[1]), {{icon: icon}});
+                        marker.bindPopup(row[2], {{maxWidth: '100%'}});
+                        return marker;
+                    }};
+                }})()
+                """,
                 icon_create_function=f"""
                 function(cluster) {{
                     var childCount = cluster.getChildCount();
@@ -255,21 +478,6 @@ def visualize_date_range_on_map(start_date_str, end_date_str, use_amsterdam=Fals
                 }}
                 """
             ).add_to(species_layers[group_id])
-            
-            for data in data_list:
-                popup_text = (
-                    f"<b>Group:</b> {data['group_name']}<br>"
-                    f"<b>Species:</b> {data['common_name']}<br>"
-                    f"<i>({data['scientific_name']})</i><br>"
-                    f"<b>Observer:</b> {data['observer']}<br>"
-                    f"<b>Location:</b> {data['location']}"
-                )
-                
-                folium.Marker(
-                    [data['lat'], data['lon']],
-                    popup=popup_text,
-                    icon=folium.Icon(color=data['group_color'], icon='info-sign')
-                ).add_to(marker_cluster)
     
     # Add species layers to map
     for layer in species_layers.values():
@@ -278,114 +486,42 @@ def visualize_date_range_on_map(start_date_str, end_date_str, use_amsterdam=Fals
     # Add layer control for toggling layers
     folium.LayerControl().add_to(m)
     
-    # Add custom CSS for colored marker clusters
-    css_style = '''
-    <style>
-    .marker-cluster-small {
-        background-color: rgba(181, 226, 140, 0.6);
-    }
-    .marker-cluster-small div {
-        background-color: rgba(110, 204, 57, 0.6);
-    }
-    
-    /* Custom colors for different species groups */
-    .marker-cluster-red {
-        background-color: rgba(255, 0, 0, 0.6) !important;
-    }
-    .marker-cluster-red div {
-        background-color: rgba(200, 0, 0, 0.8) !important;
-    }
-    
-    .marker-cluster-blue {
-        background-color: rgba(0, 0, 255, 0.6) !important;
-    }
-    .marker-cluster-blue div {
-        background-color: rgba(0, 0, 200, 0.8) !important;
-    }
-    
-    .marker-cluster-darkblue {
-        background-color: rgba(0, 0, 139, 0.6) !important;
-    }
-    .marker-cluster-darkblue div {
-        background-color: rgba(0, 0, 100, 0.8) !important;
-    }
-    
-    .marker-cluster-purple {
-        background-color: rgba(128, 0, 128, 0.6) !important;
-    }
-    .marker-cluster-purple div {
-        background-color: rgba(100, 0, 100, 0.8) !important;
-    }
-    
-    .marker-cluster-orange {
-        background-color: rgba(255, 165, 0, 0.6) !important;
-    }
-    .marker-cluster-orange div {
-        background-color: rgba(200, 130, 0, 0.8) !important;
-    }
-    
-    .marker-cluster-darkred {
-        background-color: rgba(139, 0, 0, 0.6) !important;
-    }
-    .marker-cluster-darkred div {
-        background-color: rgba(100, 0, 0, 0.8) !important;
-    }
-    
-    .marker-cluster-lightred {
-        background-color: rgba(255, 99, 99, 0.6) !important;
-    }
-    .marker-cluster-lightred div {
-        background-color: rgba(200, 70, 70, 0.8) !important;
-    }
-    
-    .marker-cluster-pink {
-        background-color: rgba(255, 192, 203, 0.6) !important;
-    }
-    .marker-cluster-pink div {
-        background-color: rgba(200, 150, 160, 0.8) !important;
-    }
-    
-    .marker-cluster-gray {
-        background-color: rgba(128, 128, 128, 0.6) !important;
-    }
-    .marker-cluster-gray div {
-        background-color: rgba(100, 100, 100, 0.8) !important;
-    }
-    </style>
-    '''
-    
     # Add a simple legend
     legend_title = f"{map_title} Map Legend"
-    legend_html = f'''
+    legend_parts = [f'''
     <div style="position: fixed; 
                 bottom: 50px; right: 50px; width: 200px; height: 200px; 
                 border:2px solid grey; z-index:9999; font-size:12px;
                 background-color:white; padding: 10px; border-radius: 5px;
                 box-shadow: 0 2px 5px rgba(0,0,0,0.2);
                 ">&nbsp;<b>{legend_title}</b><br><br>
-    '''
+    ''']
     
     # Add insect groups legend
-    legend_html += '&nbsp;<b>Insect Groups:</b><br>'
-    for group_id, (name, color) in INSECT_GROUPS.items():
-        legend_html += f'&nbsp;<i class="fa fa-circle" style="color:{color}"></i>&nbsp;{name}<br>'
+    legend_parts.append('&nbsp;<b>Insect Groups:</b><br>')
+    legend_parts.extend(f'&nbsp;<i class="fa fa-circle" style="color:{color}"></i>&nbsp;{name}<br>'
+                        for name, color in INSECT_GROUPS.values())
     
     # Add green roof information
     if show_green_roofs:
-        legend_html += '<br>&nbsp;<b>Green Roofs:</b><br>'
-        legend_html += '&nbsp;<i class="fa fa-circle" style="color:green"></i>&nbsp;Green roofs (size = area)<br>'
+        legend_parts.append('<br>&nbsp;<b>Green Roofs:</b><br>')
+        legend_parts.append('&nbsp;<i class="fa fa-circle" style="color:green"></i>&nbsp;Green roofs (size = area)<br>')
     
-    legend_html += '<br>&nbsp;<b>Use the layer control</b><br>&nbsp;<b>in the top-right to</b><br>&nbsp;<b>toggle layers on/off</b>'
-    legend_html += '</div>'
+    legend_parts.append('<br>&nbsp;<b>Use the layer control</b><br>&nbsp;<b>in the top-right to</b><br>&nbsp;<b>toggle layers on/off</b>')
+    legend_parts.append('</div>')
+    legend_html = ''.join(legend_parts)
     
-    # Add CSS and legend to map
-    m.get_root().html.add_child(folium.Element(css_style))
+    # Add cluster CSS to the page head and the legend to the body
+    m.get_root().header.add_child(folium.Element(MARKER_CLUSTER_CSS))
     m.get_root().html.add_child(folium.Element(legend_html))
 
     # Save the map to an HTML file
     data_suffix = "_amsterdam" if use_amsterdam else ""
     output_filename = f'interactive_map_{start_date_str}_to_{end_date_str}{data_suffix}.html'
-    m.save(output_filename)
+    # Render the whole document once and write it out in a single buffered write
+    html = m.get_root().render()
+    with open(output_filename, 'w', encoding='utf-8', buffering=1 << 20) as f:
+        f.write(html)
     print(f"Interactive map saved to {output_filename}")
 
 def main():